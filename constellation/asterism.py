@@ -0,0 +1,53 @@
+# coding: utf-8
+
+# Stick-figure overlays for the constellation plots.
+#
+# An asterism is a list of (star, star) index pairs. All of its segments are
+# gathered with one fancy-indexing step and added to the axes as a single
+# LineCollection (2-D) or Line3DCollection (3-D), so matplotlib keeps one
+# artist no matter how many segments there are. That keeps overlays of every
+# constellation's lines (thousands of segments) quick to draw, and in 3-D
+# rotation re-projects all segments in one vectorized call per frame instead of
+# one per plot() line.
+
+from matplotlib.collections import LineCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+import numpy as np
+
+# Orion's traditional figure over the nine stars in driscoll_constellation.py,
+# matched to the list there by visual magnitude: 0 Betelgeuse, 1 Rigel,
+# 2 Bellatrix, 3 Mintaka, 4 Alnilam, 5 Alnitak, 6 Saiph. Stars 7 and 8 are
+# fainter stars with no line through them.
+ORION = [
+    (0, 2),          # shoulders: Betelgeuse - Bellatrix
+    (0, 5), (2, 3),  # shoulders down to the belt
+    (5, 4), (4, 3),  # belt: Alnitak - Alnilam - Mintaka
+    (5, 6), (3, 1),  # belt down to the knees: Saiph and Rigel
+]
+
+LINE_STYLE = {'colors': '#f0f0ff', 'linewidths': 0.8, 'alpha': 0.6, 'zorder': 0}
+
+
+def segments(pairs, *coords):
+    """(n_segments, 2, n_dims) endpoints for index `pairs` into `coords`.
+
+    segments(pairs, x, y) gives 2-D segments, segments(pairs, x, y, z) 3-D.
+    """
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+    points = np.column_stack([np.asarray(c, dtype=float) for c in coords])
+    return points[pairs]
+
+
+def overlay_2d(ax, x, y, pairs, **style):
+    """Draw every (i, j) pair as a line from star i to star j on a 2-D axes."""
+    lines = LineCollection(segments(pairs, x, y), **dict(LINE_STYLE, **style))
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    return lines
+
+
+def overlay_3d(ax, x, y, z, pairs, **style):
+    """Draw every (i, j) pair as a line from star i to star j on a 3-D axes."""
+    lines = Line3DCollection(segments(pairs, x, y, z), **dict(LINE_STYLE, **style))
+    ax.add_collection3d(lines)
+    return lines
@@ -0,0 +1,228 @@
+# coding: utf-8
+
+# Batch small multiples: every constellation in a catalog, in 2-D and 3-D.
+#
+# driscoll_constellation.py plots one hand-entered asterism. This module
+# draws many constellations from one shared star catalog:
+#
+# + stars.csv   - one row per star: star,x,y,z,magnitude,color
+# + members.csv - one row per membership: constellation,star
+# + lines.csv   - optional stick figures, one row per segment: constellation,star_a,star_b
+#
+# Memberships are grouped into per-constellation index arrays once, and every
+# figure draws its stars by indexing the shared catalog arrays. Figures are
+# rendered in a process pool; each worker receives the catalog and applies the
+# plot styling once when it starts, not once per figure. The result is one PNG
+# per constellation and view, and optionally a multi-page PDF contact sheet.
+#
+# Usage:
+#     python batch_render.py stars.csv members.csv --lines lines.csv --out renders --sheet sky.pdf
+#     python batch_render.py --out renders       # just the Orion stars below
+
+import argparse
+import csv
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from mpl_toolkits.mplot3d import Axes3D
+import numpy as np
+
+from asterism import ORION, overlay_2d, overlay_3d
+
+Catalog = namedtuple('Catalog', ['x', 'y', 'z', 'size', 'color', 'members', 'lines'])
+
+SKY_COLOR = '#2B2F77'
+PANE_COLOR = (0.16, 0.18, 0.47, 1)
+
+# Applied once per worker process instead of re-built for every figure.
+STYLE = {
+    'figure.figsize': (4, 4),
+    'figure.dpi': 100,
+    'axes.facecolor': SKY_COLOR,
+    'axes.spines.right': False,
+    'axes.spines.top': False,
+    'axes.titlesize': 'medium',
+    'savefig.bbox': 'tight',
+}
+
+
+def group_members(constellations, stars):
+    """Split parallel (constellation, star index) lists into index arrays.
+
+    One stable sort over all memberships, then one split at the boundaries
+    between constellations: {'Orion': array([...]), ...}. `stars` may also be
+    (star, star) pairs, giving each constellation an (n, 2) array of segments.
+    """
+    constellations = np.asarray(constellations)
+    stars = np.asarray(stars, dtype=int)
+    order = np.argsort(constellations, kind='stable')
+    names, starts = np.unique(constellations[order], return_index=True)
+    return dict(zip(names, np.split(stars[order], starts[1:])))
+
+
+def load_catalog(stars_path, members_path, lines_path=None):
+    """Read a star catalog, its constellation membership lists and stick figures."""
+    with open(stars_path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    row_of = {row['star']: i for i, row in enumerate(rows)}
+
+    with open(members_path, newline='') as f:
+        members = [(row['constellation'], row_of[row['star']]) for row in csv.DictReader(f)]
+    constellations, stars = zip(*members) if members else ((), ())
+
+    lines = {}
+    if lines_path:
+        with open(lines_path, newline='') as f:
+            segments = [(row['constellation'], (row_of[row['star_a']], row_of[row['star_b']]))
+                        for row in csv.DictReader(f)]
+        if segments:
+            names, pairs = zip(*segments)
+            lines = group_members(names, pairs)
+
+    return Catalog(
+        x=np.array([float(row['x']) for row in rows]),
+        y=np.array([float(row['y']) for row in rows]),
+        z=np.array([float(row['z']) for row in rows]),
+        size=np.array([float(row['magnitude']) for row in rows]),
+        color=np.array([row['color'] for row in rows]),
+        members=group_members(constellations, stars),
+        lines=lines,
+    )
+
+
+def orion_catalog():
+    """The Orion stars from driscoll_constellation.py as a one-entry catalog."""
+    x = [-0.41, 0.57, 0.07, 0.00, -0.29, -0.32,-0.50,-0.23, -0.23]
+    y = [4.12, 7.71, 2.36, 9.10, 13.35, 8.13, 7.19, 13.25,13.43]
+    z = [2.06, 0.84, 1.56, 2.07, 2.36, 1.72, 0.66, 1.25,1.38]
+    size = [0.42, 0.18, 1.64, 2.20, 1.69, 1.88, 2.07, 2.75, 4.58 ]
+    colors = ['#fd9c89', '#e0e0ff', '#c0c0ff', '#d8d8ff', '#e0e0ff', '#d8d8ff', '#d8d8ff', '#d0d0ff', '#f0f0ff']
+    return Catalog(np.array(x), np.array(y), np.array(z), np.array(size), np.array(colors),
+                   members={'Orion': np.arange(len(x))}, lines={'Orion': np.array(ORION)})
+
+
+def draw_2d(ax, catalog, name):
+    """Scatter constellation `name` of `catalog` on a 2-D axes, as in the notebook."""
+    idx = catalog.members[name]
+    colors = catalog.color[idx]
+    ax.scatter(catalog.x[idx], catalog.y[idx], marker='*', s=50*catalog.size[idx],
+               c=colors, edgecolors=colors)
+    if name in catalog.lines:
+        overlay_2d(ax, catalog.x, catalog.y, catalog.lines[name])
+    ax.set_title('{} in 2-D'.format(name))
+    ax.xaxis.set_ticks_position('bottom')
+    ax.yaxis.set_ticks_position('left')
+    ax.set_xlabel('X axis')
+    ax.set_ylabel('Y axis')
+
+
+def draw_3d(ax, catalog, name):
+    """Scatter constellation `name` of `catalog` on a 3-D axes, as in the notebook."""
+    idx = catalog.members[name]
+    colors = catalog.color[idx]
+    ax.scatter(catalog.x[idx], catalog.y[idx], catalog.z[idx], c=colors, edgecolors=colors,
+               marker='*', s=50*catalog.size[idx])
+    if name in catalog.lines:
+        overlay_3d(ax, catalog.x, catalog.y, catalog.z, catalog.lines[name])
+    ax.set_title('{} in 3-D'.format(name))
+    ax.set_xlabel('X axis')
+    ax.set_ylabel('Y axis')
+    ax.set_zlabel('Z axis')
+    for axis in (ax.xaxis, ax.yaxis, ax.zaxis):
+        axis.set_pane_color(PANE_COLOR)
+
+
+# Per-process state, filled in by _init_worker.
+_worker = {}
+
+
+def _init_worker(catalog):
+    _worker['catalog'] = catalog
+    plt.rcParams.update(STYLE)
+
+
+def _render(name, view, out_dir):
+    """Render one constellation in one view; returns its PNG bytes."""
+    catalog = _worker['catalog']
+
+    fig = plt.figure()
+    if view == '3d':
+        draw_3d(fig.add_subplot(1, 1, 1, projection='3d'), catalog, name)
+    else:
+        draw_2d(fig.add_subplot(1, 1, 1), catalog, name)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+    png = buffer.getvalue()
+
+    if out_dir:
+        with open(os.path.join(out_dir, '{}_{}.png'.format(name.replace(' ', '_'), view)), 'wb') as f:
+            f.write(png)
+    return name, view, png
+
+
+def write_sheet(path, renders, ncols=4, nrows=4):
+    """Lay rendered PNGs out as a grid, `ncols` x `nrows` per PDF page."""
+    per_page = ncols * nrows
+    with PdfPages(path) as pdf:
+        for start in range(0, len(renders), per_page):
+            fig, axes = plt.subplots(nrows, ncols, figsize=(2.5*ncols, 2.5*nrows))
+            for ax in axes.flat:
+                ax.axis('off')
+            for ax, (name, view, png) in zip(axes.flat, renders[start:start + per_page]):
+                ax.imshow(plt.imread(io.BytesIO(png), format='png'))
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+def render_all(catalog, out_dir=None, sheet=None, views=('2d', '3d'), names=None, jobs=None):
+    """Render every constellation (or just `names`) in every view.
+
+    PNGs go to `out_dir` when given; `sheet` is an optional multi-page PDF of
+    all renders. Returns a list of (name, view, png bytes) in catalog order.
+    """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    names = sorted(catalog.members) if names is None else list(names)
+    tasks = [(name, view) for name in names for view in views]
+
+    if jobs == 1:
+        _init_worker(catalog)
+        renders = [_render(name, view, out_dir) for name, view in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(catalog,)) as pool:
+            futures = [pool.submit(_render, name, view, out_dir) for name, view in tasks]
+            renders = [f.result() for f in futures]
+
+    if sheet:
+        write_sheet(sheet, renders)
+    return renders
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render every constellation in a star catalog.')
+    parser.add_argument('stars', nargs='?', help='star catalog CSV (star,x,y,z,magnitude,color)')
+    parser.add_argument('members', nargs='?', help='membership CSV (constellation,star)')
+    parser.add_argument('--lines', help='stick figure CSV (constellation,star_a,star_b)')
+    parser.add_argument('--out', default='renders', help='folder for the PNGs')
+    parser.add_argument('--sheet', help='also write all renders to this multi-page PDF')
+    parser.add_argument('--views', nargs='+', default=['2d', '3d'], choices=['2d', '3d'])
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    options = parser.parse_args()
+    if options.stars and not options.members:
+        parser.error('a star catalog needs its membership CSV: batch_render.py stars.csv members.csv')
+    if options.lines and not options.stars:
+        parser.error('--lines refers to stars by catalog id, so it needs stars.csv and members.csv')
+
+    if options.stars:
+        catalog = load_catalog(options.stars, options.members, options.lines)
+    else:
+        catalog = orion_catalog()
+    render_all(catalog, out_dir=options.out, sheet=options.sheet, views=options.views, jobs=options.jobs)
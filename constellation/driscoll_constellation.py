@@ -32,6 +32,7 @@
 get_ipython().magic('matplotlib notebook')
 from matplotlib import pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
+from asterism import ORION, overlay_2d, overlay_3d
 
 
 # ## 2. Get familiar with real data
@@ -77,6 +78,7 @@ fig = plt.figure()
 ax = fig.add_subplot(1, 1, 1)
 
 ax.scatter(x, y, marker ='*', s=s, c=colors, edgecolors=colors)
+overlay_2d(ax, x, y, ORION)
 
 plt.title("Orion in 2-D")
 ax.spines['right'].set_visible(False)
@@ -124,6 +126,7 @@ fig_3d = plt.figure()
 ax = fig_3d.add_subplot(1, 1, 1, projection="3d")
 
 ax.scatter(x, y, z, c=colors, edgecolors=colors, marker = '*', s=s)
+overlay_3d(ax, x, y, z, ORION)
 
 plt.title("Orion in 3-D")
 ax.set_xlabel('X axis')
@@ -0,0 +1,294 @@
+# coding: utf-8
+
+# A long-running local server for the world health charts.
+#
+# The dashboard asks for the same few charts with different countries, years
+# and sizes many times a minute. Instead of re-running the analysis from the
+# CSVs each time, this server:
+#
+# + prepares the panel once, through the cached `derive` stage of pipeline.py,
+# + renders charts on demand for (chart, countries, years, size) requests,
+# + keeps rendered PNG bytes in an LRU cache bounded by total size, and
+# + coalesces identical requests that arrive while a render is in flight, so
+#   they all wait on the same render.
+#
+# pyplot is not thread-safe, so HTTP handler threads only look up the cache
+# and put work on a queue; one render thread draws every chart.
+#
+# Usage, from the world_health folder:
+#     python chart_server.py --port 8050
+#     curl 'http://127.0.0.1:8050/chart/violin.png?countries=Chile,China&years=2000-2010&size=10x6'
+#     curl 'http://127.0.0.1:8050/stats'
+
+import argparse
+import json
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+
+import charts
+import pipeline
+
+ChartRequest = namedtuple('ChartRequest', ['chart', 'countries', 'years', 'size'])
+
+
+# ## Charts
+#
+# The drawing code lives in charts.py, shared with pipeline.py; the server
+# only filters the panel and serialises the figure to PNG.
+
+CHARTS = {
+    'violin': charts.violin,
+    'gdp_bar': charts.gdp_bar,
+    'leaby_lines': charts.line_leaby,
+    'gdp_lines': charts.line_gdp,
+}
+
+
+# ## Cache
+
+class PNGCache(object):
+    """LRU cache of rendered PNG bytes, bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            if len(png) > self.max_bytes:
+                return
+            if key in self._items:
+                self.nbytes -= len(self._items.pop(key))
+            self._items[key] = png
+            self.nbytes += len(png)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._items), 'bytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+
+# ## Service
+
+class ChartService(object):
+    """Renders chart requests against one prepared panel.
+
+    render() may be called from any thread. Cache misses go on a queue for the
+    single render thread; a request that is already queued or rendering gets
+    the same Future instead of a second render.
+    """
+
+    def __init__(self, df, max_bytes=64 * 2**20, dpi=100):
+        self.df = df
+        self.dpi = dpi
+        self.cache = PNGCache(max_bytes)
+        # hits: served from the cache, misses: started a render,
+        # coalesced: waited on a render another request had started.
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+
+        charts.set_style()
+        self._thread = threading.Thread(target=self._render_loop, name='chart-render', daemon=True)
+        self._thread.start()
+
+    def normalize(self, chart, countries=None, years=None, size=(15, 6)):
+        """Turn raw request values into a hashable ChartRequest.
+
+        Country order and duplicates do not matter and `None` means every
+        country or every year, so equivalent requests share one cache entry.
+        `years` is a (first, last) pair; a missing end (None or '') runs to
+        the first or last year in the panel, and both ends are clamped to the
+        panel's years, so 1990-2030 is the same request as no years at all.
+        """
+        if chart not in CHARTS:
+            raise KeyError(chart)
+        known = set(self.df['Country'])
+        if countries:
+            countries = tuple(sorted(set(countries)))
+            unknown = set(countries) - known
+            if unknown:
+                raise ValueError('unknown countries: {}'.format(', '.join(sorted(unknown))))
+        else:
+            countries = tuple(sorted(known))
+        min_year, max_year = int(self.df['Year'].min()), int(self.df['Year'].max())
+        first, last = years or (None, None)
+        first = int(first) if first not in (None, '') else min_year
+        last = int(last) if last not in (None, '') else max_year
+        if first > last:
+            raise ValueError('years must be given as first-last')
+        years = (max(first, min_year), min(last, max_year))
+        if years[0] > years[1]:
+            raise ValueError('no data for {}-{}, the panel covers {}-{}'.format(first, last, min_year, max_year))
+        width, height = float(size[0]), float(size[1])
+        if not (0 < width <= 40 and 0 < height <= 40):
+            raise ValueError('size must be between 0 and 40 inches on each side')
+        return ChartRequest(chart, countries, years, (width, height))
+
+    def render(self, request, timeout=None):
+        """PNG bytes for a ChartRequest, from the cache or a (shared) render."""
+        # The render thread fills the cache and clears _pending under the same
+        # lock, so a request is always either cached, pending or neither.
+        with self._lock:
+            png = self.cache.get(request)
+            if png is not None:
+                self.hits += 1
+                return png
+            future = self._pending.get(request)
+            if future is None:
+                self.misses += 1
+                future = Future()
+                self._pending[request] = future
+                self._queue.put(request)
+            else:
+                self.coalesced += 1
+        return future.result(timeout)
+
+    def _draw(self, request):
+        df = self.df[self.df['Country'].isin(request.countries)
+                     & self.df['Year'].between(*request.years)]
+        if df.empty:
+            raise ValueError('no data for the requested countries and years')
+        fig = CHARTS[request.chart](df, request.size)
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png', dpi=self.dpi)
+        plt.close(fig)
+        return buffer.getvalue()
+
+    def _render_loop(self):
+        while True:
+            request = self._queue.get()
+            future = self._pending[request]
+            try:
+                png = self._draw(request)
+            except Exception as error:
+                # Drop whatever the failed chart left half drawn.
+                plt.close('all')
+                with self._lock:
+                    del self._pending[request]
+                future.set_exception(error)
+                continue
+            with self._lock:
+                self.cache.put(request, png)
+                del self._pending[request]
+            future.set_result(png)
+
+    def stats(self):
+        stats = self.cache.stats()
+        with self._lock:
+            stats.update(hits=self.hits, misses=self.misses, coalesced=self.coalesced)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+
+# ## HTTP front end
+
+def _parse_query(query):
+    params = parse_qs(query)
+    countries = None
+    if 'countries' in params:
+        countries = [c.strip() for c in ','.join(params['countries']).split(',') if c.strip()]
+    years = None
+    if 'years' in params:
+        # 2005 is a single year; 2005- and -2005 are open-ended ranges.
+        first, dash, last = params['years'][0].partition('-')
+        years = (first, last) if dash else (first, first)
+    size = (15, 6)
+    if 'size' in params:
+        width, _, height = params['size'][0].lower().partition('x')
+        size = (width, height)
+    return countries, years, size
+
+
+class ChartHandler(BaseHTTPRequestHandler):
+    """GET /chart/<name>.png?countries=A,B&years=2000-2010&size=10x6 and GET /stats.
+
+    `years` also takes a single year (2005) or an open-ended range (2005-, -2005).
+    """
+
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._send(200, 'application/json', json.dumps(self.service.stats()).encode())
+            return
+        if not (url.path.startswith('/chart/') and url.path.endswith('.png')):
+            self._send(404, 'text/plain', b'not found\n')
+            return
+
+        chart = url.path[len('/chart/'):-len('.png')]
+        try:
+            request = self.service.normalize(chart, *_parse_query(url.query))
+        except KeyError:
+            self._send(404, 'text/plain', 'unknown chart {!r}, try one of: {}\n'.format(
+                chart, ', '.join(sorted(CHARTS))).encode())
+            return
+        except ValueError as error:
+            self._send(400, 'text/plain', '{}\n'.format(error).encode())
+            return
+
+        try:
+            png = self.service.render(request)
+        except ValueError as error:
+            self._send(400, 'text/plain', '{}\n'.format(error).encode())
+            return
+        except Exception as error:
+            self.log_error('rendering %r failed: %r', request, error)
+            self._send(500, 'text/plain', 'could not render {}: {!r}\n'.format(chart, error).encode())
+            return
+        self._send(200, 'image/png', png)
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port=8050, max_bytes=64 * 2**20):
+    """Prepare the panel once and serve charts on 127.0.0.1 until interrupted."""
+    keys = pipeline.run(['derive'], verbose=False)
+    df = pipeline.load_result('derive', keys['derive'])
+
+    ChartHandler.service = ChartService(df, max_bytes=max_bytes)
+    server = ThreadingHTTPServer(('127.0.0.1', port), ChartHandler)
+    print('Serving {} on http://127.0.0.1:{}/chart/<name>.png'.format(', '.join(sorted(CHARTS)), port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the world health charts on localhost.')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-mb', type=float, default=64, help='size of the PNG cache in megabytes')
+    options = parser.parse_args()
+    serve(options.port, max_bytes=int(options.cache_mb * 2**20))
@@ -0,0 +1,142 @@
+# coding: utf-8
+
+# The charts from life_expectancy_gdp.py as plain functions.
+#
+# Each draw function takes the prepared panel (and optionally a (width,
+# height) in inches) and returns the matplotlib Figure without showing or
+# saving it. pipeline.py saves them to graphs/ and chart_server.py turns them
+# into PNG bytes, so a styling tweak only has to be made here.
+
+import math
+
+from matplotlib import pyplot as plt
+import matplotlib.ticker as mtick
+import seaborn as sns
+
+DOLLARS = '${x:,.0f}'
+
+
+def set_style():
+    """The notebook's seaborn style; call once before drawing."""
+    sns.set_style('darkgrid')
+    sns.set_palette('Set2')
+
+
+def facet_grid(df, size, col, col_wrap, **kwargs):
+    """sns.FacetGrid with `col_wrap` panels per row, sized to fill `size`."""
+    n_panels = df[col].nunique()
+    ncols = min(col_wrap, n_panels)
+    nrows = int(math.ceil(n_panels / float(ncols)))
+    height = size[1] / float(nrows)
+    return sns.FacetGrid(df, col=col, col_wrap=col_wrap, height=height,
+                         aspect=size[0] / float(ncols) / height, **kwargs)
+
+
+# ## Averages by country (Step 5, Step 12)
+
+def country_bar(df, size, column, title, dollars=False):
+    fig, ax = plt.subplots(figsize=size)
+    sns.barplot(data=df, x='Country', y=column, ax=ax)
+    if dollars:
+        ax.yaxis.set_major_formatter(mtick.StrMethodFormatter(DOLLARS))
+    sns.despine(ax=ax)
+    ax.set_title(title)
+    return fig
+
+
+def gdp_bar(df, size=(15, 6)):
+    return country_bar(df, size, 'GDP (in trillions)', 'GDP by Country', dollars=True)
+
+
+def leaby_bar(df, size=(15, 6)):
+    return country_bar(df, size, 'LEABY', 'Life Expectancy at Birth by Country')
+
+
+def gdp_per_capita_bar(df, size=(15, 6)):
+    return country_bar(df, size, 'GDP per capita (in thousands)', 'GDP per capita by Country', dollars=True)
+
+
+# ## Country by year (Step 7, Step 12)
+
+def year_bar(df, size, column, title, dollars=False):
+    fig, ax = plt.subplots(figsize=size)
+    sns.barplot(data=df, x='Country', y=column, hue='Year', ax=ax)
+    if dollars:
+        ax.yaxis.set_major_formatter(mtick.StrMethodFormatter(DOLLARS))
+    ax.set_title(title)
+    return fig
+
+
+def gdp_by_year(df, size=(10, 15)):
+    return year_bar(df, size, 'GDP (in trillions)', "Country's GDP by Year", dollars=True)
+
+
+def leaby_by_year(df, size=(10, 15)):
+    fig = year_bar(df, size, 'LEABY', "Country's Life Expectancy at Birth by Year")
+    fig.axes[0].set(ylabel='Life Expectancy at Birth')
+    return fig
+
+
+def gdp_per_capita_by_year(df, size=(10, 15)):
+    return year_bar(df, size, 'GDP per capita (in thousands)', "Country's GDP per capita by Year", dollars=True)
+
+
+# ## Distribution (Step 6)
+
+def violin(df, size=(15, 6)):
+    fig, ax2 = plt.subplots(figsize=size)
+    sns.violinplot(data=df, x='Country', y='LEABY', ax=ax2)
+    sns.despine(ax=ax2)
+    ax2.set_title('Life Expectancy at Birth by Country')
+    return fig
+
+
+# ## GDP against LEABY, one panel per year (Step 8)
+
+def year_scatter(df, size, column):
+    g = facet_grid(df, size, col='Year', col_wrap=4, hue='Country')
+    g = (g.map(plt.scatter, column, 'LEABY', edgecolor="gray").add_legend())
+    return g.fig
+
+
+def scatter_gdp(df, size=(8, 8)):
+    return year_scatter(df, size, 'GDP (in trillions)')
+
+
+def scatter_gdp_per_capita(df, size=(8, 8)):
+    return year_scatter(df, size, 'GDP per capita (in thousands)')
+
+
+# ## One line per country (Steps 9, 10 and 12)
+
+def country_lines(df, size, column, dollars=False):
+    g3 = facet_grid(df, size, col="Country", col_wrap=3)
+    g3 = (g3.map(plt.plot, "Year", column).add_legend())
+    if dollars:
+        for ax in g3.axes.flat:
+            ax.yaxis.set_major_formatter(mtick.StrMethodFormatter(DOLLARS))
+    return g3.fig
+
+
+def line_leaby(df, size=(12, 8)):
+    return country_lines(df, size, "LEABY")
+
+
+def line_gdp(df, size=(12, 8)):
+    return country_lines(df, size, "GDP (in trillions)", dollars=True)
+
+
+def line_gdp_per_capita(df, size=(12, 8)):
+    return country_lines(df, size, "GDP per capita (in thousands)", dollars=True)
+
+
+def line_population(df, size=(12, 8)):
+    return country_lines(df, size, "Population (in millions)")
+
+
+def line_rolling_corr(stats, size=(12, 8)):
+    """Rolling correlation per country, from panel_stats.panel_stats output."""
+    g4 = facet_grid(stats, size, col="Country", col_wrap=3)
+    g4 = (g4.map(plt.plot, "Year", "GDP per capita-LEABY pearson (5y)").add_legend())
+    g4.set_axis_labels("Year", "5-year rolling correlation")
+    return g4.fig
@@ -635,3 +635,37 @@ g3.savefig('Line_Population.png')
 
 
 
+
+
+# ## Growth Rates and Rolling Correlation
+# 
+# Instead of eyeballing the line charts, `panel_stats` computes year-over-year growth, rolling means and the rolling
+# correlation between GDP and LEABY for every country at once.
+
+# In[ ]:
+
+from panel_stats import panel_stats
+
+stats = panel_stats(df, x='GDP per capita', y='LEABY', windows=(5,))
+
+g4 = sns.FacetGrid(stats, col="Country", col_wrap=3, size=4)
+g4 = (g4.map(plt.plot, "Year", "GDP per capita-LEABY pearson (5y)").add_legend())
+g4.set_axis_labels("Year", "5-year rolling correlation")
+g4.savefig('Line_RollingCorr.png')
+
+
+# ## Permutation and Bootstrap Checks
+# 
+# The OLS p-values above assume independent errors, which yearly data rarely has. As a check, shuffle blocks of
+# 3 consecutive years of GDP within each country (permutation test) and resample whole countries (cluster bootstrap),
+# refitting the same model 10,000 times each.
+
+# In[ ]:
+
+from resampling import permutation_test, cluster_bootstrap
+
+for indicator in ['GDP (in trillions)', 'GDP per capita (in thousands)']:
+    perm_summary, perm_replicates = permutation_test(df, indicator, n_resamples=10000, block=3, seed=2018)
+    boot_summary, boot_replicates = cluster_bootstrap(df, indicator, n_resamples=10000, seed=2018)
+    print(perm_summary)
+    print(boot_summary)
@@ -0,0 +1,179 @@
+# coding: utf-8
+
+# Panel time-series statistics for the World Health data.
+#
+# The notebook answers "did GDP growth track LEABY gains?" by eyeballing the
+# FacetGrid line charts. The functions below compute year-over-year growth,
+# rolling means and rolling GDP-LEABY correlations for every country at once.
+#
+# Every statistic is computed on a wide (Year x Country) array, so all six
+# countries are handled by the same numpy operation instead of a per-country
+# groupby().apply(). Rolling sums use cumulative sums and Spearman windows use
+# a strided view, and results are stacked back to (Country, Year) rows so they
+# line up with `df` and can go straight into sns.FacetGrid.
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.stats import rankdata
+
+
+def to_wide(df, column):
+    """Pivot one column of the long panel into a (Year x Country) frame."""
+    return df.pivot(index='Year', columns='Country', values=column).sort_index()
+
+
+def to_long(wide, name):
+    """Flatten a (Year x Country) frame back to Country/Year rows."""
+    years, countries = wide.index, wide.columns
+    return pd.DataFrame({
+        'Country': np.tile(countries, len(years)),
+        'Year': np.repeat(years, len(countries)),
+        name: wide.to_numpy().ravel(),
+    })
+
+
+def _rolling_sum(values, window):
+    """Trailing `window`-row sums down axis 0 via a cumulative sum.
+
+    Rows before a full window is available, and windows containing a NaN,
+    come back as NaN.
+    """
+    missing = np.isnan(values)
+    filled = np.where(missing, 0.0, values)
+
+    zeros = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    cmiss = np.concatenate([zeros, np.cumsum(missing, axis=0)])
+
+    out = np.full(values.shape, np.nan)
+    out[window - 1:] = csum[window:] - csum[:-window]
+    has_missing = np.zeros(values.shape, dtype=bool)
+    has_missing[window - 1:] = (cmiss[window:] - cmiss[:-window]) > 0
+    out[has_missing] = np.nan
+    return out
+
+
+def growth_rate(wide, periods=1):
+    """Year-over-year growth, e.g. 0.05 for 5%, for every country at once."""
+    values = wide.to_numpy(dtype=float)
+    out = np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[periods:] = values[periods:] / values[:-periods] - 1
+    return pd.DataFrame(out, index=wide.index, columns=wide.columns)
+
+
+def rolling_mean(wide, window):
+    """Trailing `window`-year mean for every country at once."""
+    values = wide.to_numpy(dtype=float)
+    out = _rolling_sum(values, window) / window
+    return pd.DataFrame(out, index=wide.index, columns=wide.columns)
+
+
+def _pearson_windows(x, y, window):
+    # Correlation does not change under a per-country shift and scale, so
+    # standardise first: GDP is ~1e13 and its squares would otherwise swamp
+    # the cumulative sums.
+    x = (x - np.nanmean(x, axis=0)) / np.nanstd(x, axis=0)
+    y = (y - np.nanmean(y, axis=0)) / np.nanstd(y, axis=0)
+
+    sx = _rolling_sum(x, window)
+    sy = _rolling_sum(y, window)
+    sxx = _rolling_sum(x * x, window)
+    syy = _rolling_sum(y * y, window)
+    sxy = _rolling_sum(x * y, window)
+
+    cov = sxy - sx * sy / window
+    var_x = sxx - sx * sx / window
+    var_y = syy - sy * sy / window
+
+    # Differences of cumulative sums leave rounding noise (~1e-15 per unit of
+    # the running total) where a window is constant, e.g. LEABY flat to one
+    # decimal, so treat near-zero variances as zero: the correlation is
+    # undefined there, as it is in _spearman_windows.
+    flat = (var_x <= 1e-12 * window) | (var_y <= 1e-12 * window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = cov / np.sqrt(var_x * var_y)
+    r[flat] = np.nan
+    return r
+
+
+def _spearman_windows(x, y, window):
+    # (Year - window + 1, Country, window) views onto the original arrays;
+    # ranks are taken along the last axis for every window and country at once.
+    out = np.full(x.shape, np.nan)
+    if window > len(x):
+        # No full window yet, as in _rolling_sum.
+        return out
+    x_win = sliding_window_view(x, window, axis=0)
+    y_win = sliding_window_view(y, window, axis=0)
+    missing = np.isnan(x_win).any(axis=-1) | np.isnan(y_win).any(axis=-1)
+
+    x_rank = rankdata(x_win, axis=-1)
+    y_rank = rankdata(y_win, axis=-1)
+    x_rank = x_rank - x_rank.mean(axis=-1, keepdims=True)
+    y_rank = y_rank - y_rank.mean(axis=-1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (x_rank * y_rank).sum(axis=-1) / np.sqrt(
+            (x_rank ** 2).sum(axis=-1) * (y_rank ** 2).sum(axis=-1))
+    r[missing] = np.nan
+    out[window - 1:] = r
+    return out
+
+
+def rolling_corr(wide_x, wide_y, window, method='pearson'):
+    """Trailing `window`-year correlation between two indicators per country.
+
+    `method` is 'pearson' or 'spearman'. The value for a year covers that year
+    and the `window - 1` years before it.
+    """
+    if window < 2:
+        raise ValueError('window must be at least 2 years')
+    wide_y = wide_y.reindex(index=wide_x.index, columns=wide_x.columns)
+    x = wide_x.to_numpy(dtype=float)
+    y = wide_y.to_numpy(dtype=float)
+
+    if method == 'pearson':
+        out = _pearson_windows(x, y, window)
+    elif method == 'spearman':
+        out = _spearman_windows(x, y, window)
+    else:
+        raise ValueError("method must be 'pearson' or 'spearman', got %r" % method)
+    return pd.DataFrame(out, index=wide_x.index, columns=wide_x.columns)
+
+
+def panel_stats(df, x='GDP', y='LEABY', windows=(3, 5), methods=('pearson', 'spearman')):
+    """Add growth, rolling mean and rolling x-y correlation columns to `df`.
+
+    Returns a copy of `df` with, for every window size `w`:
+        '<x> growth', '<y> growth'
+        '<x> rolling mean (<w>y)', '<y> rolling mean (<w>y)'
+        '<x>-<y> <method> (<w>y)'
+
+    e.g. panel_stats(df, x='GDP per capita', windows=(5,)) gives a
+    'GDP per capita-LEABY pearson (5y)' column ready for
+    sns.FacetGrid(..., col='Country').
+    """
+    wide_x = to_wide(df, x)
+    wide_y = to_wide(df, y)
+
+    stats = {
+        '{} growth'.format(x): growth_rate(wide_x),
+        '{} growth'.format(y): growth_rate(wide_y),
+    }
+    for window in windows:
+        stats['{} rolling mean ({}y)'.format(x, window)] = rolling_mean(wide_x, window)
+        stats['{} rolling mean ({}y)'.format(y, window)] = rolling_mean(wide_y, window)
+        for method in methods:
+            name = '{}-{} {} ({}y)'.format(x, y, method, window)
+            stats[name] = rolling_corr(wide_x, wide_y, window, method=method)
+
+    # All of the wide frames share one (Year x Country) layout, so they can be
+    # stacked side by side and merged back in a single step.
+    long = to_long(wide_x, x)[['Country', 'Year']]
+    for name, wide in stats.items():
+        long[name] = to_long(wide, name)[name].to_numpy()
+
+    out = df.drop(columns=[c for c in stats if c in df.columns])
+    return pd.merge(out, long, how='left', on=['Country', 'Year'])
@@ -0,0 +1,343 @@
+# coding: utf-8
+
+# The life_expectancy_gdp analysis as a set of cached stages.
+#
+# life_expectancy_gdp.py runs top to bottom: load -> melt -> merge -> derive ->
+# charts -> regressions, so restyling one chart means re-running everything
+# above it. Here every step is a stage that declares its inputs (other stages
+# and data files) and the files it writes. Each result is pickled under
+# .stage_cache/ keyed by a hash of:
+#
+# + the stage's own source code,
+# + the keys of the stages it reads from, and the contents of its data files.
+#
+# A stage whose key already has a cached result (and whose output files are
+# still the ones that run wrote) is skipped. Stages that need to run are handed to a process pool as
+# soon as their inputs are ready, so independent branches such as the charts
+# and the regressions render at the same time.
+#
+# Usage, from the world_health folder:
+#     python pipeline.py                  # run whatever is out of date
+#     python pipeline.py violin           # only what the violin plot needs
+#     python pipeline.py --force violin   # re-render it even if cached
+
+import argparse
+import hashlib
+import inspect
+import os
+import pickle
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+import pandas as pd
+import statsmodels.api as sm
+
+import charts
+import panel_stats
+import resampling
+from resampling import design_matrix
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '.stage_cache')
+GRAPHS_DIR = os.path.join(HERE, 'graphs')
+
+Stage = namedtuple('Stage', ['func', 'inputs', 'files', 'outputs', 'code'])
+STAGES = {}
+
+
+def stage(*inputs, files=(), outputs=(), code=()):
+    """Register a function as a pipeline stage.
+
+    `inputs` name the stages whose results are passed to the function, in
+    order. `files` are data files (relative to this folder) the stage reads,
+    and `outputs` are files it writes; both are part of the cache check.
+    `code` lists the helper functions (or whole modules) the stage calls,
+    whose source is hashed along with the stage's own.
+    """
+    def register(func):
+        STAGES[func.__name__] = Stage(func, inputs, files, outputs, code)
+        return func
+    return register
+
+
+# ## Data stages
+
+@stage(files=['all_data.csv'])
+def load_data():
+    df = pd.read_csv(os.path.join(HERE, 'all_data.csv'))
+    return df
+
+
+@stage(files=['gdp_per_capita.csv'])
+def load_per_capita():
+    per_capita = pd.read_csv(os.path.join(HERE, 'gdp_per_capita.csv'))
+    # Older pandas keeps the byte order mark in the first header ('\ufeffCountry Name').
+    country_name = per_capita.columns[0]
+    per_capita=pd.melt(per_capita, id_vars=country_name, var_name='Year', value_name='GDP per capita')
+    per_capita.rename(columns={country_name:'Country'}, inplace=True)
+    per_capita[['Year']] = per_capita[['Year']].astype(int)
+    per_capita['Country']=per_capita['Country'].str.replace('United States', 'United States of America')
+    return per_capita
+
+
+@stage('load_data', 'load_per_capita')
+def merge(df, per_capita):
+    df = pd.merge(df, per_capita, how='inner', on=['Country','Year'])
+    df['Population']=df['GDP']/df['GDP per capita']
+    return df
+
+
+@stage('merge')
+def derive(df):
+    df = df.rename(columns={'Life expectancy at birth (years)':'LEABY'})
+    df['GDP (in trillions)'] = df['GDP']/(10**12)
+    df['GDP per capita (in thousands)'] = df['GDP per capita']/(10**3)
+    df['Population (in millions)'] = df['Population']/(10**6)
+    return df
+
+
+# ## Chart stages
+#
+# The charts are drawn by charts.py. Every chart stage hashes the whole
+# module, so a change to a shared helper, the style or a constant such as
+# DOLLARS re-renders every chart that could depend on it.
+
+def chart_stage(draw, input, filename):
+    """Register a stage that draws `draw(result of input)` to graphs/<filename>."""
+    def render(df):
+        charts.set_style()
+        fig = draw(df)
+        path = os.path.join(GRAPHS_DIR, filename)
+        fig.savefig(path, bbox_inches='tight')
+        plt.close(fig)
+        return path
+    render.__name__ = draw.__name__
+    return stage(input, outputs=['graphs/' + filename], code=[charts])(render)
+
+
+# Steps 5 and 12: averages by country
+chart_stage(charts.gdp_bar, 'derive', 'Bar_GDP.png')
+chart_stage(charts.leaby_bar, 'derive', 'Bar_LEABY.png')
+chart_stage(charts.gdp_per_capita_bar, 'derive', 'Bar_GDPcapita.png')
+# Steps 7 and 12: every year by country
+chart_stage(charts.gdp_by_year, 'derive', 'Bar_GDPbyYear.png')
+chart_stage(charts.leaby_by_year, 'derive', 'Bar_LEABYbyYear.png')
+chart_stage(charts.gdp_per_capita_by_year, 'derive', 'Bar_GDPcapitabyYear.png')
+# Step 6
+chart_stage(charts.violin, 'derive', 'LEABY_Violin.png')
+# Step 8
+chart_stage(charts.scatter_gdp, 'derive', 'Scatter_LEABYvGDP.png')
+chart_stage(charts.scatter_gdp_per_capita, 'derive', 'Scatter_LEABYvGDPcapita.png')
+# Steps 9, 10 and 12
+chart_stage(charts.line_leaby, 'derive', 'Line_LEABY.png')
+chart_stage(charts.line_gdp, 'derive', 'Line_GDP.png')
+chart_stage(charts.line_gdp_per_capita, 'derive', 'Line_GDPcapita.png')
+chart_stage(charts.line_population, 'derive', 'Line_Population.png')
+# Growth Rates and Rolling Correlation
+chart_stage(charts.line_rolling_corr, 'rolling_stats', 'Line_RollingCorr.png')
+
+
+# ## Regression stages
+
+@stage('derive', code=[design_matrix])
+def ols_gdp(df):
+    X, y = design_matrix(df, 'GDP (in trillions)')
+    model = sm.OLS(y, X).fit()
+    return model.summary().as_text()
+
+
+@stage('derive', code=[design_matrix])
+def ols_gdp_per_capita(df):
+    X, y = design_matrix(df, 'GDP per capita (in thousands)')
+    model = sm.OLS(y, X).fit()
+    return model.summary().as_text()
+
+
+# ## Growth rates and resampling checks
+
+@stage('derive', code=[panel_stats])
+def rolling_stats(df):
+    return panel_stats.panel_stats(df, x='GDP per capita', y='LEABY', windows=(5,))
+
+
+# The pipeline already runs stages side by side, so each check fits its
+# replicates in this worker (n_jobs=1) rather than starting a pool of its own.
+
+@stage('derive', code=[resampling])
+def resampling_gdp(df):
+    perm_summary, _ = resampling.permutation_test(df, 'GDP (in trillions)', n_resamples=10000, block=3,
+                                                  seed=2018, n_jobs=1)
+    boot_summary, _ = resampling.cluster_bootstrap(df, 'GDP (in trillions)', n_resamples=10000, seed=2018, n_jobs=1)
+    return perm_summary, boot_summary
+
+
+@stage('derive', code=[resampling])
+def resampling_gdp_per_capita(df):
+    perm_summary, _ = resampling.permutation_test(df, 'GDP per capita (in thousands)', n_resamples=10000, block=3,
+                                                  seed=2018, n_jobs=1)
+    boot_summary, _ = resampling.cluster_bootstrap(df, 'GDP per capita (in thousands)', n_resamples=10000,
+                                                   seed=2018, n_jobs=1)
+    return perm_summary, boot_summary
+
+
+# ## Cache and scheduling
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(name, keys):
+    """Hash a stage's code and helpers, its upstream keys and its data files.
+
+    `keys` must already hold the keys of every stage in `inputs`, so a change
+    anywhere upstream changes the key of everything downstream of it without
+    re-hashing any data.
+    """
+    spec = STAGES[name]
+    digest = hashlib.sha256()
+    digest.update(name.encode())
+    for func in (spec.func,) + tuple(spec.code):
+        digest.update(inspect.getsource(func).encode())
+    for dep in spec.inputs:
+        digest.update(keys[dep].encode())
+    for path in spec.files:
+        digest.update(_file_hash(os.path.join(HERE, path)).encode())
+    for path in spec.outputs:
+        digest.update(path.encode())
+    return digest.hexdigest()
+
+
+def _cache_path(name, key):
+    return os.path.join(CACHE_DIR, '{}-{}.pkl'.format(name, key[:16]))
+
+
+# A cache file holds two pickles: the hashes of the stage's output files as
+# they were written, then the result. is_cached() only reads the first.
+
+def is_cached(name, key):
+    """True when the result for `key` is on disk and every output file still
+    matches what that run wrote.
+
+    A missing output, or one overwritten since (say by a run with different
+    styling that was later reverted), counts as a miss.
+    """
+    path = _cache_path(name, key)
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        output_hashes = pickle.load(f)
+    for output, digest in output_hashes.items():
+        output = os.path.join(HERE, output)
+        if not os.path.exists(output) or _file_hash(output) != digest:
+            return False
+    return True
+
+
+def load_result(name, key):
+    with open(_cache_path(name, key), 'rb') as f:
+        pickle.load(f)  # output hashes
+        return pickle.load(f)
+
+
+def _run_stage(name, key, input_keys):
+    """Run one stage from its cached inputs and persist the result.
+
+    Module level so it can be sent to a worker process: the worker reads its
+    inputs from the cache instead of having them pickled across.
+    """
+    spec = STAGES[name]
+    args = [load_result(dep, dep_key) for dep, dep_key in zip(spec.inputs, input_keys)]
+    start = time.time()
+    result = spec.func(*args)
+    output_hashes = {output: _file_hash(os.path.join(HERE, output)) for output in spec.outputs}
+
+    path = _cache_path(name, key)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump(output_hashes, f)
+        pickle.dump(result, f)
+    os.replace(tmp, path)
+    return time.time() - start
+
+
+def _upstream(targets):
+    """Every stage needed for `targets`, in dependency order."""
+    order = []
+    def visit(name):
+        if name not in STAGES:
+            raise KeyError('unknown stage {!r}'.format(name))
+        if name in order:
+            return
+        for dep in STAGES[name].inputs:
+            visit(dep)
+        order.append(name)
+    for name in targets:
+        visit(name)
+    return order
+
+
+def run(targets=None, force=(), jobs=None, verbose=True):
+    """Bring `targets` (default: every stage) up to date.
+
+    Returns a dict of stage name -> cache key, which load_result() accepts.
+    Stages named in `force` are re-run even when cached.
+    """
+    order = _upstream(targets or list(STAGES))
+    keys = {}
+    for name in order:
+        keys[name] = stage_key(name, keys)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    os.makedirs(GRAPHS_DIR, exist_ok=True)
+
+    pending = [name for name in order if name in force or not is_cached(name, keys[name])]
+    done = set(order) - set(pending)
+    if verbose:
+        for name in order:
+            if name in done:
+                print('{:<26} cached'.format(name))
+
+    def stage_args(name):
+        return (name, keys[name], [keys[dep] for dep in STAGES[name].inputs])
+
+    def report(name, seconds):
+        if verbose:
+            print('{:<26} ran in {:.2f}s'.format(name, seconds))
+
+    # Starting worker processes costs more than a single chart, so a lone
+    # out-of-date stage (the usual restyling case) runs right here.
+    if jobs == 1 or len(pending) <= 1:
+        for name in pending:
+            report(name, _run_stage(*stage_args(name)))
+        return keys
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                if all(dep in done for dep in STAGES[name].inputs):
+                    pending.remove(name)
+                    running[pool.submit(_run_stage, *stage_args(name))] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                report(name, future.result())
+                done.add(name)
+    return keys
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the life expectancy / GDP analysis stages.')
+    parser.add_argument('targets', nargs='*', help='stages to bring up to date (default: all)')
+    parser.add_argument('--force', nargs='*', default=[], help='stages to re-run even if cached')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    options = parser.parse_args()
+    run(options.targets, force=options.force, jobs=options.jobs)